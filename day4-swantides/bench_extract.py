@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for extract_tides.py on the bundled BOM PDFs and scaled-up synthetic inputs.
+
+Results can be saved as JSON and compared with an earlier run; any benchmark
+slower than the previous result by more than the threshold fails the run.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import date, datetime, timedelta
+
+import extract_tides as et
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_parse_merged_text(text):
+    match = re.match(r'^([A-Z]{2,3})(\d{4})$', text)
+    if match:
+        return [match.group(1), match.group(2)]
+    return [text]
+
+
+def legacy_extract_from_column(words, month_idx):
+    """The original token-dict/while-loop column parser, kept as the baseline."""
+    words.sort(key=lambda w: (round(w['top']), w['x0']))
+
+    entries = []
+    current_day = None
+
+    tokens_stream = []
+    for w in words:
+        for t in legacy_parse_merged_text(w['text']):
+            tokens_stream.append({'text': t, 'top': w['top']})
+
+    i = 0
+    while i < len(tokens_stream):
+        token = tokens_stream[i]['text']
+
+        if token.isdigit() and len(token) <= 2 and 1 <= int(token) <= 31:
+            current_day = int(token)
+            i += 1
+            continue
+
+        if re.match(r'^\d{4}$', token):
+            time_str = token
+            if i + 1 < len(tokens_stream):
+                next_token = tokens_stream[i+1]['text']
+                try:
+                    height = float(next_token)
+                    if 0.0 <= height <= 2.5 and current_day is not None:
+                        try:
+                            d = date(et.YEAR, month_idx + 1, current_day)
+                            entries.append({
+                                'date': d.isoformat(),
+                                'time': f"{time_str[:2]}:{time_str[2:]}",
+                                'height': height
+                            })
+                        except ValueError:
+                            pass
+                    i += 2
+                    continue
+                except ValueError:
+                    pass
+
+        i += 1
+
+    return entries
+
+
+def load_pages(locations, cache_dir=et.CACHE_DIR):
+    """Return (loc, page_idx, month_indices, words) for every table page of every location."""
+    pages = []
+    for loc in locations:
+        for page_idx, month_indices in et.PAGE_MAP.items():
+            words = et.get_page_words(loc['pdf'], page_idx, {"cache_dir": cache_dir})
+            if words is not None:
+                pages.append((loc, page_idx, month_indices, words))
+    return pages
+
+
+def load_columns(pages):
+    """Return (column, month_idx) pairs for every column of `pages`."""
+    columns = []
+    for _, _, month_indices, words in pages:
+        for col_idx, column in enumerate(et.bucket_words(words)):
+            if col_idx // 2 < len(month_indices):
+                columns.append((column, month_indices[col_idx // 2]))
+    return columns
+
+
+def stack_page(words, copies, page_height=842):
+    """A page `copies` times as dense: the words repeated below themselves."""
+    return [{**w, 'top': w['top'] + k * page_height, 'bottom': w['bottom'] + k * page_height}
+            for k in range(copies) for w in words]
+
+
+def repeat_years(table, copies):
+    """`table` followed by `copies - 1` copies shifted a whole number of weeks later each."""
+    shift = 52 * 7 * 1440
+    return et.TideTable.concat([
+        et.TideTable(table.minutes + k * shift, table.height_mm, table.kind) for k in range(copies)
+    ])
+
+
+def copy_stations(locations, root, copies):
+    """Copy every bundled PDF under `copies` new station codes. Copies share cache entries."""
+    codes = iter(range(100, 1000))
+    for _ in range(copies):
+        for loc in locations:
+            name = f"IDO59001_{loc['year']}_WA_TP{next(codes):03d}.pdf"
+            shutil.copyfile(loc['pdf'], os.path.join(root, name))
+    return et.discover_locations(root, root, catalogue={})
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the extractor's progress output."""
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def extract_table(loc):
+    with quiet():
+        raw = et.extract_all(loc['pdf'], opts={"cache_dir": et.CACHE_DIR})
+    return raw, et.classify_table(et.TideTable.from_entries(raw).unique(), loc.get('threshold'))
+
+
+class Runner:
+    """Times callables and collects {name: seconds per call}."""
+
+    def __init__(self, number=None, repeat=5):
+        self.number = number
+        self.repeat = repeat
+        self.results = {}
+
+    def bench(self, name, fn, number=None, repeat=None):
+        timer = timeit.Timer(fn)
+        with quiet():
+            number = number or self.number or timer.autorange()[0]
+            seconds = min(timer.repeat(number=number, repeat=repeat or self.repeat)) / number
+        self.results[name] = {"seconds": seconds, "number": number}
+        print(f"{name:<40} {seconds * 1e3:10.3f} ms")
+        return seconds
+
+
+def bench_tokenizer(runner, columns):
+    def legacy():
+        return [legacy_extract_from_column(list(col), m) for col, m in columns]
+
+    def current():
+        return [et.extract_from_column(col, m, presorted=True) for col, m in columns]
+
+    assert legacy() == current(), "tokenizer output differs from the legacy parser"
+    unexpected = sum(et.scan_column(col)[1] for col, _ in columns)
+    words = sum(len(col) for col, _ in columns)
+    print(f"{len(columns)} columns, {words} words, {unexpected} unexpected tokens")
+
+    runner.bench("scan_column", lambda: [et.scan_column(col) for col, _ in columns])
+    before = runner.bench("legacy extract_from_column", legacy)
+    after = runner.bench("extract_from_column", current)
+    print(f"speedup: {before / after:.1f}x")
+
+
+def bench_pages(runner, locations, pages):
+    runner.bench("get_page_words [cached]",
+                 lambda: [et.get_page_words(loc['pdf'], i, {"cache_dir": et.CACHE_DIR}) for loc, i, _, _ in pages])
+    runner.bench("bucket_words", lambda: [et.bucket_words(words) for _, _, _, words in pages])
+    runner.bench("infer_layout", lambda: et.infer_layout([None] + [words for loc, _, _, words in pages
+                                                                   if loc is locations[0]]))
+    runner.bench("extract_page [cached]",
+                 lambda: [et.extract_page(loc['pdf'], i, months, opts={"cache_dir": et.CACHE_DIR})
+                          for loc, i, months, _ in pages])
+    runner.bench("extract_all [cached]",
+                 lambda: [et.extract_all(loc['pdf'], opts={"cache_dir": et.CACHE_DIR, "layout": "auto"})
+                          for loc in locations])
+
+
+def bench_cold(runner, locations):
+    """Uncached word extraction: one call each, as these take seconds."""
+    pdf = locations[0]['pdf']
+    for backend in et.BACKENDS:
+        runner.bench(f"get_page_words [{backend}]",
+                     lambda: et.get_page_words(pdf, 1, {"backend": backend}), number=1, repeat=1)
+
+
+def bench_tables(runner, locations, tmp):
+    raw, table = extract_table(locations[0])
+    threshold = locations[0].get('threshold')
+    year = locations[0]['year']
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    print(f"{len(table)} tides")
+
+    runner.bench("TideTable.from_entries", lambda: et.TideTable.from_entries(raw).unique())
+    runner.bench("classify_table", lambda: et.classify_table(table, threshold))
+    runner.bench("classify_tides", lambda: et.classify_tides(raw, threshold))
+    runner.bench("validate_table", lambda: et.validate_table(table, start, end))
+    runner.bench("TideTable.to_records", table.to_records)
+    blob = et.encode_binary(table)
+    runner.bench("encode_binary", lambda: et.encode_binary(table))
+    runner.bench("decode_binary", lambda: et.decode_binary(blob))
+    runner.bench("tide_curve [year, 1 min]", lambda: et.tide_curve(table, start, end))
+    runner.bench("TideWindowIndex", lambda: et.TideWindowIndex(table))
+    index = et.TideWindowIndex(table)
+    runner.bench("TideWindowIndex.windows", lambda: index.windows(0.2, 0.45, "07:00", "17:00"))
+
+    built = [{**loc, "output": os.path.join(tmp, os.path.basename(loc['output']))} for loc in locations]
+    for loc in built:
+        et.finish_location(loc, extract_table(loc)[0])
+    db = os.path.join(tmp, "tides.db")
+    runner.bench("export_sqlite", lambda: et.export_sqlite(built, db))
+    runner.bench("query_tides", lambda: et.query_tides(db, kind="low", max_height=0.4, time_from="07:00",
+                                                       time_to="17:00"))
+
+
+def bench_synthetic(runner, locations, pages, tmp, scale):
+    """The same functions on inputs `scale` times larger: denser pages, longer tables, more stations."""
+    dense = [et.bucket_words(stack_page(words, scale)) for _, _, _, words in pages]
+    runner.bench(f"bucket_words [x{scale} density]",
+                 lambda: [et.bucket_words(stack_page(words, scale)) for _, _, _, words in pages[:1]])
+    runner.bench(f"extract_from_column [x{scale} density]",
+                 lambda: [et.extract_from_column(col, 0) for columns in dense for col in columns])
+
+    table = repeat_years(extract_table(locations[0])[1], scale)
+    threshold = locations[0].get('threshold')
+    start = et.EPOCH + timedelta(minutes=int(table.minutes[0]))
+    end = et.EPOCH + timedelta(minutes=int(table.minutes[-1]))
+    runner.bench(f"classify_table [x{scale} years]", lambda: et.classify_table(table, threshold))
+    runner.bench(f"validate_table [x{scale} years]", lambda: et.validate_table(table, start, end))
+    runner.bench(f"tide_curve [x{scale} years, 1 min]", lambda: et.tide_curve(table, start, end))
+
+    stations = copy_stations(locations, tmp, scale)
+    opts = {"cache_dir": et.CACHE_DIR, "layout": "auto"}
+    runner.bench(f"run_locations [{len(stations)} stations, cached]",
+                 lambda: list(et.run_locations(stations, 1, opts)), number=1, repeat=3)
+
+
+def compare(results, previous, threshold):
+    """Print each benchmark against `previous` and return the names slower than `threshold`x."""
+    slower = []
+    print(f"\n{'benchmark':<40} {'now ms':>10} {'was ms':>10} {'ratio':>7}")
+    for name, result in results.items():
+        if name not in previous:
+            continue
+        ratio = result['seconds'] / previous[name]['seconds']
+        flag = "  SLOWER" if ratio > threshold else ""
+        print(f"{name:<40} {result['seconds'] * 1e3:10.3f} {previous[name]['seconds'] * 1e3:10.3f} "
+              f"{ratio:7.2f}{flag}")
+        if ratio > threshold:
+            slower.append(name)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("-n", "--number", type=int,
+                        help="calls per timing sample (default: calibrated per benchmark)")
+    parser.add_argument("--scale", type=int, default=10,
+                        help="size multiplier for the synthetic benchmarks (default: 10)")
+    parser.add_argument("--cold", action="store_true",
+                        help="also time uncached word extraction with each backend")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="fail when a benchmark is this many times slower than before (default: 1.25)")
+    args = parser.parse_args()
+
+    locations = et.discover_locations(HERE, HERE)
+    if not locations:
+        sys.exit(f"No IDO59001_<year>_WA_TPxxx.pdf files in {HERE}")
+    runner = Runner(args.number)
+
+    with quiet():
+        pages = load_pages(locations)  # warms the word cache
+    bench_tokenizer(runner, load_columns(pages))
+    bench_pages(runner, locations, pages)
+    if args.cold:
+        bench_cold(runner, locations)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_tables(runner, locations, tmp)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_synthetic(runner, locations, pages, tmp, args.scale)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "scale": args.scale,
+                "results": runner.results,
+            }, f, indent=2)
+        print(f"→ {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(runner.results, json.load(f)['results'], args.threshold)
+        if slower:
+            sys.exit(f"{len(slower)} benchmarks slower than {args.threshold}x: {', '.join(slower)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,66 @@ Extract tide data from BOM PDF tide charts.
 Outputs JSON files for each location.
 """
 
+import argparse
+import hashlib
+import importlib.util
 import json
+import os
 import re
+import sqlite3
+import struct
 import sys
-from collections import defaultdict
-from datetime import datetime, date
+import time
+import tracemalloc
+import zlib
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from datetime import datetime, date, timedelta
 
-try:
-    import pdfplumber
-except ImportError:
-    print("ERROR: pdfplumber required. Run: pip install pdfplumber")
+
+def lazy_import(name):
+    """Import `name` on first attribute access, so runs that never touch it don't pay for loading it."""
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+np = sys.modules.get("numpy") or lazy_import("numpy")
+if np is None:
+    print("ERROR: numpy required. Run: pip install numpy")
     sys.exit(1)
 
-LOCATIONS = [
-    {"name": "Fremantle", "pdf": "IDO59001_2026_WA_TP015.pdf", "output": "tides_fremantle.json"},
-    {"name": "Barrack Street", "pdf": "IDO59001_2026_WA_TP062.pdf", "output": "tides_barrack.json"}
-]
+# PDF parsers, imported by load_pdf_parsers() once a page actually has to be parsed.
+pdfplumber = None
+PDFDocument = PDFPage = PDFPageInterpreter = PDFParser = PDFResourceManager = None
+PDFUnicodeNotDefined = CharDevice = None
+
+# Station names and output files, by BOM station code.
+CATALOGUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stations.json")
+PDF_PATTERN = re.compile(r'IDO59001_(\d{4})_WA_(TP\d{3})\.pdf')
+INDEX_FILE = "tides_index.json"
 
 YEAR = 2026
 
+# Tide times are local standard time (UTC+08:00), counted in minutes from this date.
+EPOCH = date(1970, 1, 1)
+TIDE_TYPES = ("", "low", "high")
+
+# Binary output: 16-byte header, then uint16 minute deltas, int16 heights in cm,
+# and a little-endian bitmask with bit i set when tide i is high.
+BINARY_MAGIC = b"TIDE"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sBBHIi')  # magic, version, flags, reserved, count, start minute
+
+# Plausible number of tides per day, and the longest plausible gap between tides.
+TIDES_PER_DAY = (1, 4)
+MAX_GAP_HOURS = 20
+
 COLUMN_RANGES = [
     (30, 92), (92, 155), (155, 222), (222, 293),
     (293, 357), (357, 428), (428, 492), (492, 600)
@@ -34,181 +75,1922 @@ PAGE_MAP = {
     3: [8, 9, 10, 11]
 }
 
+# Keyword arguments passed to page.extract_words(); part of the word cache key.
+WORD_PARAMS = {}
 
-def get_column_index(x):
-    for i, (min_x, max_x) in enumerate(COLUMN_RANGES):
-        if min_x <= x < max_x:
-            return i
-    return -1
+BACKENDS = ("pdfplumber", "fast")
 
+# Word-splitting tolerances used by the fast backend, matching extract_words() defaults;
+# part of the word cache key.
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
 
-def parse_merged_text(text):
-    """Handle merged text like 'TU1413' -> ['TU', '1413']."""
-    match = re.match(r'^([A-Z]{2,3})(\d{4})$', text)
-    if match:
-        return [match.group(1), match.group(2)]
-    return [text]
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "words")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAGIC = b"TWC1"
+CACHE_FIELDS = ('x0', 'x1', 'top', 'bottom')
 
+LAYOUT_CACHE_NAME = "layouts.json"
+FINGERPRINT_CACHE_NAME = "fingerprints.json"  # PDF sha256 -> layout fingerprint
+LAYOUT_MODES = ("auto", "fixed")
+
+MONTHS = [
+    "JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
+    "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"
+]
+
+# Kept in the output directory (or --store), beside the files it records.
+MANIFEST_FILE = ".extract_manifest.json"
+
+# --watch rebuilds once the input PDFs have stopped changing for this long, in seconds.
+WATCH_DEBOUNCE = 0.25
+
+# Settings threaded from the CLI through to page workers. Plain dict so it pickles.
+DEFAULT_OPTIONS = {
+    "cache_dir": None,
+    "backend": "pdfplumber",
+    "layout": "auto",
+    "profile": False,
+}
+
+# The options that change what is written, and so invalidate the build manifest.
+OUTPUT_OPTIONS = ("backend", "layout")
+
+
+class Profile:
+    """Wall time, CPU time and tracemalloc peak per named stage, overall and per page.
+
+    Stages must not nest: each resets the tracemalloc peak when it starts.
+    Peaks are only recorded while tracemalloc is tracing.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.pages = {}
+
+    @staticmethod
+    def _add(stages, name, sample):
+        total = stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_kb": 0.0})
+        total['calls'] += sample['calls']
+        total['wall_s'] += sample['wall_s']
+        total['cpu_s'] += sample['cpu_s']
+        total['peak_kb'] = max(total['peak_kb'], sample['peak_kb'])
+
+    @contextmanager
+    def stage(self, name, page=None):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            sample = {
+                "calls": 1,
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                "peak_kb": (tracemalloc.get_traced_memory()[1] - base) / 1024 if tracing else 0.0,
+            }
+            self._add(self.stages, name, sample)
+            if page is not None:
+                self._add(self.pages.setdefault(str(page + 1), {}), name, sample)
+
+    def merge(self, report):
+        """Fold in another Profile's to_dict(), e.g. from a worker process."""
+        for name, sample in report['stages'].items():
+            self._add(self.stages, name, sample)
+        for page, stages in report['pages'].items():
+            for name, sample in stages.items():
+                self._add(self.pages.setdefault(page, {}), name, sample)
+
+    def to_dict(self):
+        return {"stages": self.stages, "pages": self.pages}
+
+
+# The Profile collecting stage() timings in this process, if any.
+_PROFILE = None
+
+
+@contextmanager
+def profiling(profile):
+    """Send stage() timings to `profile` (None disables) for the duration of the block."""
+    global _PROFILE
+    previous, _PROFILE = _PROFILE, profile
+    try:
+        yield profile
+    finally:
+        _PROFILE = previous
+
+
+def stage(name, page=None):
+    """Time a pipeline stage in the active Profile; a no-op when not profiling."""
+    return nullcontext() if _PROFILE is None else _PROFILE.stage(name, page)
+
+
+def bucket_words(words, ranges=COLUMN_RANGES):
+    """Partition a page's words into column bands in one pass.
+
+    Returns one list per band, each already in the (round(top), x0) reading
+    order extract_from_column() needs.
+    """
+    starts = [min_x for min_x, _ in ranges]
+    columns = [[] for _ in ranges]
+    for w in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        x = w['x0']
+        i = bisect_right(starts, x) - 1
+        if i >= 0 and x < ranges[i][1]:
+            columns[i].append(w)
+    return columns
+
+
+MERGED_RE = re.compile(r'([A-Z]{2,3})(\d{4})')
+DAY_RE = re.compile(r'[0-9]{1,2}')
+TIME_RE = re.compile(r'\d{4}')
+NUMBER_RE = re.compile(r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?')
+
+
+def scan_column(words):
+    """Turn a column's words (in reading order) into (day, 'HHMM', height) rows.
+
+    A day number sets the current day; a four-digit time followed by a number
+    is a tide. Merged weekday/time words like 'TU1413' are split inline.
+    Returns (rows, unexpected), where unexpected counts table tokens after the
+    first day number that could not be used: a time with no height after it,
+    or a number that is neither a day, a time nor a plausible height. Weekday
+    codes, labels and other text are expected and not counted.
+    """
+    rows = []
+    unexpected = 0
+    day = None
+    pending = None
 
-def extract_from_column(words, month_idx):
-    words.sort(key=lambda w: (round(w['top']), w['x0']))
-    
-    entries = []
-    current_day = None
-    
-    tokens_stream = []
     for w in words:
-        for t in parse_merged_text(w['text']):
-            tokens_stream.append({'text': t, 'top': w['top']})
-    
-    i = 0
-    while i < len(tokens_stream):
-        token = tokens_stream[i]['text']
-        
-        if token.isdigit() and len(token) <= 2 and 1 <= int(token) <= 31:
-            current_day = int(token)
-            i += 1
+        text = w['text']
+        merged = MERGED_RE.fullmatch(text)
+        if merged:
+            # The weekday prefix is never a height, so it cancels any pending time.
+            if pending is not None:
+                unexpected += 1
+            pending = None
+            text = merged.group(2)
+
+        if pending is not None:
+            pending_time, pending = pending, None
+            if NUMBER_RE.fullmatch(text):
+                height = float(text)
+                if 0.0 <= height <= 2.5:
+                    rows.append((day, pending_time, height))
+                else:
+                    unexpected += 1
+                continue
+            unexpected += 1
+
+        if DAY_RE.fullmatch(text) and 1 <= int(text) <= 31:
+            day = int(text)
+        elif day is None:
             continue
-        
-        if re.match(r'^\d{4}$', token):
-            time_str = token
-            if i + 1 < len(tokens_stream):
-                next_token = tokens_stream[i+1]['text']
-                try:
-                    height = float(next_token)
-                    if 0.0 <= height <= 2.5 and current_day is not None:
-                        try:
-                            d = date(YEAR, month_idx + 1, current_day)
-                            entries.append({
-                                'date': d.isoformat(),
-                                'time': f"{time_str[:2]}:{time_str[2:]}",
-                                'height': height
-                            })
-                        except ValueError:
-                            pass
-                    i += 2
-                    continue
-                except ValueError:
-                    pass
-        
-        i += 1
-    
+        elif TIME_RE.fullmatch(text):
+            pending = text
+        elif NUMBER_RE.fullmatch(text):
+            unexpected += 1
+
+    if pending is not None:
+        unexpected += 1
+    return rows, unexpected
+
+
+def extract_from_column(words, month_idx, presorted=False, year=YEAR):
+    if not presorted:
+        words.sort(key=lambda w: (round(w['top']), w['x0']))
+
+    rows, _ = scan_column(words)
+    return rows_to_entries(rows, month_idx, year)
+
+
+def rows_to_entries(rows, month_idx, year=YEAR):
+    """scan_column() rows as entry dicts, dropping days the month does not have."""
+    entries = []
+    for day, hhmm, height in rows:
+        try:
+            d = date(year, month_idx + 1, day)
+        except ValueError:
+            continue
+        entries.append({
+            'date': d.isoformat(),
+            'time': f"{hhmm[:2]}:{hhmm[2:]}",
+            'height': height
+        })
+
     return entries
 
 
-def extract_all(pdf_file):
-    print(f"Opening {pdf_file}...")
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def word_cache_path(cache_dir, pdf_digest, page_idx, backend="pdfplumber"):
+    key = {"backend": backend, "x_tolerance": X_TOLERANCE, "y_tolerance": Y_TOLERANCE, **WORD_PARAMS}
+    params = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{pdf_digest}-p{page_idx}-{params}.bin")
+
+
+def save_words(path, words):
+    """Write a page's words as zlib-compressed packed records. `None` marks a missing page."""
+    if words is None:
+        body = struct.pack('<i', -1)
+    else:
+        parts = [struct.pack('<i', len(words))]
+        for w in words:
+            text = w['text'].encode('utf-8')
+            parts.append(struct.pack('<4dH', *(w[k] for k in CACHE_FIELDS), len(text)))
+            parts.append(text)
+        body = b''.join(parts)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(CACHE_MAGIC + zlib.compress(body))
+    os.replace(tmp, path)
+
+
+def load_words(path):
+    """Inverse of save_words(). Raises OSError/ValueError if the entry is absent or corrupt."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:4] != CACHE_MAGIC:
+        raise ValueError(f"bad cache entry: {path}")
+    body = zlib.decompress(raw[4:])
+
+    count, = struct.unpack_from('<i', body)
+    if count < 0:
+        return None
+    words = []
+    offset = 4
+    record = struct.Struct('<4dH')
+    for _ in range(count):
+        *coords, n = record.unpack_from(body, offset)
+        offset += record.size
+        w = dict(zip(CACHE_FIELDS, coords))
+        w['text'] = body[offset:offset + n].decode('utf-8')
+        offset += n
+        words.append(w)
+    os.utime(path)  # mtime doubles as last-used time for eviction
+    return words
+
+
+def prune_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """Delete least recently used entries until the cache fits in `max_bytes`."""
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith('.bin')]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    total = 0
+    for e in entries:
+        total += e.stat().st_size
+        if total > max_bytes:
+            os.remove(e.path)
+
+
+def load_pdf_parsers():
+    """Import pdfplumber and pdfminer, which take longer to load than a cached run takes to finish.
+
+    Raises ImportError with install instructions when they are missing.
+    """
+    global pdfplumber, PDFDocument, PDFPage, PDFPageInterpreter, PDFParser, PDFResourceManager
+    global PDFUnicodeNotDefined, CharDevice
+    if pdfplumber is not None:
+        return
+    try:
+        import pdfplumber as plumber
+        from pdfminer.pdfdevice import PDFTextDevice
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdffont import PDFUnicodeNotDefined
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+    except ImportError as e:
+        raise ImportError("pdfplumber required. Run: pip install pdfplumber") from e
+    CharDevice = type("CharDevice", (CharCollector, PDFTextDevice), {})
+    pdfplumber = plumber
+
+
+def load_deferred_imports():
+    """Load numpy and, when installed, the PDF parsers now rather than on first use.
+
+    --profile calls this before timing anything, so the imports are not
+    charged to whichever station's stage happens to touch them first.
+    """
+    np.ndarray  # a lazily imported module executes on first attribute access
+    try:
+        load_pdf_parsers()
+    except ImportError:
+        pass  # reported when a page actually has to be parsed
+
+
+class CharCollector:
+    """pdfminer device that records (text, x0, x1, top, bottom) per glyph and nothing else.
+
+    Skips building LTChar objects and pdfplumber's per-char dicts, which is
+    where most of page.chars' time goes. Assumes upright text, as in the BOM
+    tables. Mixed into pdfminer's PDFTextDevice as CharDevice by load_pdf_parsers().
+    """
+
+    def __init__(self, rsrcmgr, page_top):
+        super().__init__(rsrcmgr)
+        self.page_top = page_top
+        self.chars = []
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = ''
+        adv = font.char_width(cid) * fontsize * scaling
+        a, b, c, d, e, f = matrix
+        y0 = d * (font.get_descent() * fontsize + rise) + f
+        y1 = y0 + d * fontsize
+        self.chars.append((text, e, e + a * adv, self.page_top - y1, self.page_top - y0))
+        return adv
+
+
+def glyphs_to_word(glyphs):
+    return {
+        'text': ''.join(g[0] for g in glyphs),
+        'x0': min(g[1] for g in glyphs),
+        'x1': max(g[2] for g in glyphs),
+        'top': min(g[3] for g in glyphs),
+        'bottom': max(g[4] for g in glyphs),
+    }
+
+
+def chars_to_words(chars):
+    """Group (text, x0, x1, top, bottom) glyphs into words the way extract_words() does.
+
+    Lines are clusters of `top` values no more than Y_TOLERANCE apart; within a
+    line, a new word starts at whitespace or an x gap wider than X_TOLERANCE.
+    Glyphs are not clipped to any column layout, so the cached words can be
+    bucketed by whichever layout is resolved for the PDF.
+    """
+    chars = list(chars)
+    line_of = {}
+    line = -1
+    last = None
+    for top in sorted({c[3] for c in chars}):
+        if last is None or top - last > Y_TOLERANCE:
+            line += 1
+        line_of[top] = line
+        last = top
+
+    chars.sort(key=lambda c: (line_of[c[3]], c[1], c[3]))
+
+    words = []
+    current = []
+    for c in chars:
+        text, x0, x1, top, bottom = c
+        if text.isspace():
+            new_word, c = True, None
+        elif current:
+            prev = current[-1]
+            new_word = x0 < prev[1] or x0 > prev[2] + X_TOLERANCE or abs(top - prev[3]) > Y_TOLERANCE \
+                or line_of[top] != line_of[prev[3]]
+        else:
+            new_word = False
+        if new_word and current:
+            words.append(glyphs_to_word(current))
+            current = []
+        if c is not None:
+            current.append(c)
+    if current:
+        words.append(glyphs_to_word(current))
+    return words
+
+
+def fast_page_words(pdf_file, page_idx):
+    """Read one page's glyphs straight from the pdfminer content stream. None if no such page."""
+    load_pdf_parsers()
+    with open(pdf_file, 'rb') as fp:
+        with stage("open", page_idx):
+            doc = PDFDocument(PDFParser(fp))
+            for i, page in enumerate(PDFPage.create_pages(doc)):
+                if i == page_idx:
+                    break
+            else:
+                page = None
+        if page is None:
+            return None
+
+        print(f"Processing Page {page_idx + 1}...", file=sys.stderr)
+        with stage("extract_words", page_idx):
+            rsrcmgr = PDFResourceManager()
+            device = CharDevice(rsrcmgr, page.mediabox[3])
+            PDFPageInterpreter(rsrcmgr, device).process_page(page)
+            return chars_to_words(device.chars)
+
+
+def get_page_words(pdf_file, page_idx, opts=None, pdf_digest=None):
+    """Return the words on one page, or None if the PDF has no such page."""
+    opts = {**DEFAULT_OPTIONS, **(opts or {})}
+    cache_dir, backend = opts['cache_dir'], opts['backend']
+    path = None
+    if cache_dir:
+        if pdf_digest is None:
+            with stage("hash"):
+                pdf_digest = file_sha256(pdf_file)
+        path = word_cache_path(cache_dir, pdf_digest, page_idx, backend)
+        try:
+            with stage("cache_load", page_idx):
+                return load_words(path)
+        except (OSError, ValueError, zlib.error, struct.error):
+            pass
+
+    if backend == "fast":
+        words = fast_page_words(pdf_file, page_idx)
+    else:
+        load_pdf_parsers()
+        with stage("open", page_idx):
+            pdf = pdfplumber.open(pdf_file)
+            page = pdf.pages[page_idx] if page_idx < len(pdf.pages) else None
+        with pdf:
+            if page is None:
+                words = None
+            else:
+                print(f"Processing Page {page_idx + 1}...", file=sys.stderr)
+                with stage("extract_words", page_idx):
+                    words = page.extract_words(**WORD_PARAMS)
+
+    if path:
+        with stage("cache_save", page_idx):
+            save_words(path, words)
+    return words
+
+
+def is_table_token(text):
+    return bool(NUMBER_RE.fullmatch(text) or MERGED_RE.fullmatch(text))
+
+
+def time_anchors(below):
+    """Sorted x0 of the first row of 'Time' labels among the words below the month names."""
+    labels = [w for w in below if w['text'] == 'Time']
+    if not labels:
+        return []
+    row = min(round(w['top']) for w in labels)
+    return sorted(w['x0'] for w in labels if abs(round(w['top']) - row) <= Y_TOLERANCE)
+
+
+def header_positions(words):
+    """{'months', 'month_x', 'time_x'} for a table page's headers, or None without month names.
+
+    These place the table on the page, so a cached layout can be checked
+    against a PDF by reading just one of its pages.
+    """
+    headers = sorted((w for w in words or [] if w['text'] in MONTHS), key=lambda w: w['x0'])
+    if not headers:
+        return None
+    header_top = min(w['top'] for w in headers)
+    return {
+        "months": [MONTHS.index(w['text']) for w in headers],
+        "month_x": [round(w['x0'], 1) for w in headers],
+        "time_x": [round(x, 1) for x in time_anchors([w for w in words if w['top'] > header_top])],
+    }
+
+
+def headers_match(expected, actual):
+    """Whether two header_positions() agree on the months and, within X_TOLERANCE, their positions."""
+    if expected is None or actual is None or expected['months'] != actual['months']:
+        return False
+    return all(len(expected[k]) == len(actual[k])
+               and all(abs(a - b) <= X_TOLERANCE for a, b in zip(expected[k], actual[k]))
+               for k in ("month_x", "time_x"))
+
+
+def infer_column_ranges(words, header_top):
+    """Infer column bands from the 'Time' header labels below the month names.
+
+    Each band holds day numbers, then times (aligned under 'Time'), then
+    heights. The boundary between two bands is the middle of the widest gap in
+    token x positions between their 'Time' labels, i.e. between one band's
+    heights and the next band's day numbers.
+    """
+    below = [w for w in words if w['top'] > header_top]
+    anchors = time_anchors(below)
+    if not anchors:
+        raise ValueError("no 'Time' column headers below the month names")
+
+    xs = sorted(w['x0'] for w in below if is_table_token(w['text']))
+    if not xs or xs[0] >= anchors[0]:
+        raise ValueError("no day numbers left of the first column")
+
+    edges = [round(xs[0] - X_TOLERANCE, 1)]
+    for left, right in zip(anchors, anchors[1:]):
+        between = [x for x in xs if left + X_TOLERANCE < x < right - X_TOLERANCE]
+        if len(between) < 2:
+            raise ValueError(f"cannot separate columns between x={left:.0f} and x={right:.0f}")
+        gap, lo, hi = max((b - a, a, b) for a, b in zip(between, between[1:]))
+        edges.append(round((lo + hi) / 2, 1))
+    edges.append(round(max(w['x1'] for w in words) + X_TOLERANCE, 1))
+
+    return list(zip(edges, edges[1:]))
+
+
+def infer_layout(pages):
+    """Infer {'column_ranges', 'page_map', 'headers'} from every page's words (None for missing pages).
+
+    Pages are tables when they carry month-name headers; their months, in x
+    order, give the page's month indices. Column bands and the
+    header_positions() kept for checking the layout come from the first table page.
+    """
+    page_map = {}
+    column_ranges = headers = None
+    for page_idx, words in enumerate(pages):
+        positions = header_positions(words)
+        if positions is None:
+            continue
+        page_map[page_idx] = positions['months']
+        if column_ranges is None:
+            column_ranges = infer_column_ranges(words, min(w['top'] for w in words if w['text'] in MONTHS))
+            headers = positions
+
+    if not page_map:
+        raise ValueError("no month headers found")
+    months_per_page = max(len(months) for months in page_map.values())
+    if len(column_ranges) != 2 * months_per_page:
+        raise ValueError(f"found {len(column_ranges)} columns for {months_per_page} months per page")
+    return {"column_ranges": column_ranges, "page_map": page_map, "headers": headers}
+
+
+def layout_fingerprint(pdf_file):
+    """Hash the document properties that pin down the table template.
+
+    BOM tables from one template share producer metadata and page geometry, so
+    these pick a candidate layout without parsing any page content. The
+    table can still sit elsewhere on the page, so resolve_layout() checks the
+    candidate's headers before using it.
+    """
+    load_pdf_parsers()
+    with open(pdf_file, 'rb') as fp:
+        doc = PDFDocument(PDFParser(fp))
+        info = doc.info[0] if doc.info else {}
+        key = {
+            "info": [repr(info.get(k)) for k in ("Creator", "Producer", "Subject")],
+            "pages": [[float(v) for v in page.mediabox] for page in PDFPage.create_pages(doc)],
+        }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def page_count(pdf_file):
+    load_pdf_parsers()
+    with open(pdf_file, 'rb') as fp:
+        return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(fp))))
+
+
+def read_pages(pdf_file, opts=None, pdf_digest=None, pool=None):
+    """Every page's words in page order, read in parallel on `pool` when given."""
+    if pool is None:
+        pages = []
+        while not pages or pages[-1] is not None:
+            pages.append(get_page_words(pdf_file, len(pages), opts, pdf_digest))
+        return pages[:-1]
+    futures = [submit_worker(pool, opts, get_page_words, pdf_file, page_idx, opts, pdf_digest)
+               for page_idx in range(page_count(pdf_file))]
+    return [worker_result(future) for future in futures]
+
+
+def load_cache_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# Layouts inferred in this process, by fingerprint, for runs without a cache directory.
+_LAYOUTS = {}
+
+
+def resolve_layout(pdf_file, opts=None, pdf_digest=None, pool=None):
+    """Return (layout, pages) for `pdf_file`: the constants, or an inferred layout cached by fingerprint.
+
+    Fingerprints are cached by the PDF's hash too, so a PDF seen before is
+    resolved without loading the PDF parsers. A cached layout is only used
+    when its header_positions() match the PDF's first table page; otherwise,
+    or when there is none, every page is read (on `pool` if given) and the
+    layout inferred again. `pages` maps the index of each page read here to
+    its words, so extraction need not read them again.
+    """
+    opts = {**DEFAULT_OPTIONS, **(opts or {})}
+    if opts['layout'] == "fixed":
+        return {"column_ranges": COLUMN_RANGES, "page_map": PAGE_MAP}, {}
+
+    cache_dir = opts['cache_dir']
+    fingerprints = load_cache_json(os.path.join(cache_dir, FINGERPRINT_CACHE_NAME)) if cache_dir else {}
+    fingerprint = fingerprints.get(pdf_digest)
+    if fingerprint is None:
+        with stage("layout"):
+            fingerprint = layout_fingerprint(pdf_file)
+        if cache_dir and pdf_digest:
+            fingerprints[pdf_digest] = fingerprint
+            save_cache_json(os.path.join(cache_dir, FINGERPRINT_CACHE_NAME), fingerprints)
+
+    cache_path = cache_dir and os.path.join(cache_dir, LAYOUT_CACHE_NAME)
+    layouts = load_cache_json(cache_path) if cache_path else {}
+    pages = {}
+    layout = _LAYOUTS.get(fingerprint) or layouts.get(fingerprint)
+    if layout is not None:
+        page_idx = min(int(k) for k in layout['page_map'])
+        pages[page_idx] = get_page_words(pdf_file, page_idx, opts, pdf_digest)
+        with stage("layout"):
+            if not headers_match(layout.get('headers'), header_positions(pages[page_idx])):
+                layout = None
+    if layout is None:
+        print(f"Detecting layout of {pdf_file}...", file=sys.stderr)
+        pages = dict(enumerate(read_pages(pdf_file, opts, pdf_digest, pool)))
+        with stage("layout"):
+            layout = infer_layout(pages.values())
+        if cache_path:
+            # JSON object keys are strings; store page indices as such.
+            layouts[fingerprint] = {**layout, "page_map": {str(k): v for k, v in layout['page_map'].items()}}
+            save_cache_json(cache_path, layouts)
+
+    layout = {
+        "column_ranges": [tuple(r) for r in layout['column_ranges']],
+        "page_map": {int(k): v for k, v in layout['page_map'].items()},
+        "headers": layout['headers'],
+    }
+    _LAYOUTS[fingerprint] = layout
+    return layout, pages
+
+
+def extract_page(pdf_file, page_idx, month_indices, column_ranges=COLUMN_RANGES, opts=None,
+                 pdf_digest=None, year=YEAR, words=None):
+    """Extract one page's entries in month order.
+
+    Returns (entries, unexpected), where unexpected is scan_column()'s count
+    of table tokens that could not be used. Opens the PDF itself so it can run
+    in a worker, unless the page's `words` have already been read.
+    """
+    if words is None:
+        words = get_page_words(pdf_file, page_idx, opts, pdf_digest)
+    if words is None:
+        return [], 0
+
+    with stage("bucket", page_idx):
+        columns = bucket_words(words, column_ranges)
+
+    entries = []
+    unexpected = 0
+    with stage("extract_from_column", page_idx):
+        for col_idx, column in enumerate(columns):
+            offset = col_idx // 2
+            if offset >= len(month_indices):
+                continue
+            rows, skipped = scan_column(column)
+            entries.extend(rows_to_entries(rows, month_indices[offset], year))
+            unexpected += skipped
+
+    return entries, unexpected
+
+
+def profiled(fn, *args):
+    """fn(*args) in a worker process, returning {'result', 'profile': the worker's Profile.to_dict()}."""
+    if not tracemalloc.is_tracing():
+        load_deferred_imports()
+        tracemalloc.start()
+    with profiling(Profile()) as profile:
+        result = fn(*args)
+    return {"result": result, "profile": profile.to_dict()}
+
+
+def submit_worker(pool, opts, fn, *args):
+    """pool.submit(fn, *args), wrapped in profiled() when opts['profile'] is set."""
+    if (opts or {}).get('profile'):
+        return pool.submit(profiled, fn, *args)
+    return pool.submit(fn, *args)
+
+
+def worker_result(future):
+    """A submit_worker() future's result, folding a profiled() report into the active Profile."""
+    result = future.result()
+    if isinstance(result, dict):
+        if _PROFILE is not None:
+            _PROFILE.merge(result['profile'])
+        result = result['result']
+    return result
+
+
+def submit_pages(pool, pdf_file, opts=None, year=YEAR):
+    """Queue every table page of `pdf_file` on `pool`, in page order.
+
+    Pages already read while resolving the layout are extracted here, since
+    that is cheaper than sending their words to a worker.
+    """
+    from concurrent.futures import Future
+
+    print(f"Opening {pdf_file}...", file=sys.stderr)
+    opts = {**DEFAULT_OPTIONS, **(opts or {})}
+    pdf_digest = None
+    if opts['cache_dir']:
+        with stage("hash"):
+            pdf_digest = file_sha256(pdf_file)
+    layout, pages = resolve_layout(pdf_file, opts, pdf_digest, pool)
+    futures = []
+    for page_idx, month_indices in sorted(layout['page_map'].items()):
+        if page_idx not in pages:
+            futures.append(submit_worker(pool, opts, extract_page, pdf_file, page_idx, month_indices,
+                                         layout['column_ranges'], opts, pdf_digest, year))
+        else:
+            futures.append(Future())
+            futures[-1].set_result(extract_page(pdf_file, page_idx, month_indices, layout['column_ranges'],
+                                                opts, pdf_digest, year, words=pages[page_idx]))
+    return futures
+
+
+def merge_pages(futures):
+    """Concatenate extract_page() futures into (entries, unexpected)."""
     all_entries = []
-    
-    with pdfplumber.open(pdf_file) as pdf:
-        for page_idx, month_indices in PAGE_MAP.items():
-            if page_idx >= len(pdf.pages):
-                break
-            
-            print(f"Processing Page {page_idx + 1}...")
-            page = pdf.pages[page_idx]
-            words = page.extract_words()
-            
-            columns = defaultdict(list)
-            for w in words:
-                col_idx = get_column_index(w['x0'])
-                if col_idx != -1:
-                    columns[col_idx].append(w)
-            
-            for col_idx in range(8):
-                offset = col_idx // 2
-                if offset >= len(month_indices):
-                    continue
-                month_idx = month_indices[offset]
-                all_entries.extend(extract_from_column(columns[col_idx], month_idx))
+    unexpected = 0
+    for future in futures:
+        entries, skipped = worker_result(future)
+        all_entries.extend(entries)
+        unexpected += skipped
+    return all_entries, unexpected
+
 
+def iter_pages(pdf_file, opts=None, year=YEAR, pool=None):
+    """Yield each table page's (entries, unexpected) in page order, from `pool` when given."""
+    if pool is not None:
+        for future in submit_pages(pool, pdf_file, opts, year):
+            yield worker_result(future)
+        return
+
+    print(f"Opening {pdf_file}...", file=sys.stderr)
+    opts = {**DEFAULT_OPTIONS, **(opts or {})}
+    pdf_digest = None
+    if opts['cache_dir']:
+        with stage("hash"):
+            pdf_digest = file_sha256(pdf_file)
+    layout, pages = resolve_layout(pdf_file, opts, pdf_digest)
+    for page_idx, month_indices in sorted(layout['page_map'].items()):
+        yield extract_page(pdf_file, page_idx, month_indices, layout['column_ranges'],
+                           opts, pdf_digest, year, words=pages.get(page_idx))
+
+
+def extract_all(pdf_file, jobs=1, opts=None, year=YEAR):
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return merge_pages(submit_pages(pool, pdf_file, opts, year))[0]
+
+    all_entries = []
+    for entries, _ in iter_pages(pdf_file, opts, year):
+        all_entries.extend(entries)
     return all_entries
 
 
-def classify_tides(tides):
+def to_minutes(dt):
+    """Local datetime (or date) -> minutes since EPOCH."""
+    if not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    return (dt.date().toordinal() - EPOCH.toordinal()) * 1440 + dt.hour * 60 + dt.minute
+
+
+class TideTable:
+    """Tides as parallel arrays, 7 bytes per tide instead of one dict each.
+
+    `minutes` counts local minutes since EPOCH (int32), `height_mm` is the
+    height in millimetres (int16) and `kind` indexes TIDE_TYPES (uint8,
+    0 until classified). Convert to dicts only when writing JSON.
+    """
+
+    __slots__ = ("minutes", "height_mm", "kind")
+
+    def __init__(self, minutes=(), height_mm=(), kind=None):
+        self.minutes = np.asarray(minutes, dtype=np.int32)
+        self.height_mm = np.asarray(height_mm, dtype=np.int16)
+        if kind is None:
+            kind = np.zeros(len(self.minutes), dtype=np.uint8)
+        self.kind = np.asarray(kind, dtype=np.uint8)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from dicts with 'date', 'time' ('HH:MM'), 'height' (m) and optional 'type'."""
+        epoch = EPOCH.toordinal()
+        minutes, heights, kinds = [], [], []
+        for e in entries:
+            day = date.fromisoformat(e['date']).toordinal() - epoch
+            minutes.append(day * 1440 + int(e['time'][:2]) * 60 + int(e['time'][3:]))
+            heights.append(round(e['height'] * 1000))
+            kinds.append(TIDE_TYPES.index(e.get('type', '')))
+        return cls(minutes, heights, kinds)
+
+    @classmethod
+    def concat(cls, tables):
+        tables = list(tables)
+        return cls(np.concatenate([t.minutes for t in tables] or [[]]),
+                   np.concatenate([t.height_mm for t in tables] or [[]]),
+                   np.concatenate([t.kind for t in tables] or [[]]))
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def __getitem__(self, key):
+        """Slice, boolean mask or index array -> TideTable."""
+        return TideTable(self.minutes[key], self.height_mm[key], self.kind[key])
+
+    @property
+    def heights(self):
+        return self.height_mm / 1000.0
+
+    def sort(self):
+        return self[np.argsort(self.minutes, kind='stable')]
+
+    def unique(self):
+        """Sorted by time, keeping the last tide recorded at each minute."""
+        rev = self.minutes[::-1]
+        _, first_in_rev = np.unique(rev, return_index=True)
+        return self[len(self) - 1 - first_in_rev]
+
+    def between(self, start, end):
+        """Tides at or after `start` and before `end` (datetimes); table must be sorted."""
+        lo, hi = np.searchsorted(self.minutes, [to_minutes(start), to_minutes(end)])
+        return self[lo:hi]
+
+    def datetimes(self):
+        return (np.datetime64(EPOCH, 'm') + self.minutes.astype('timedelta64[m]'))
+
+    def to_records(self):
+        stamps = np.datetime_as_string(self.datetimes(), unit='m')
+        records = []
+        for stamp, height, kind in zip(stamps.tolist(), self.heights.tolist(), self.kind.tolist()):
+            record = {'date': stamp[:10], 'time': stamp[11:], 'height': height}
+            if kind:
+                record['type'] = TIDE_TYPES[kind]
+            records.append(record)
+        return records
+
+
+def classify_table(table, threshold=None):
+    """Label each tide high or low in place; `table` must be sorted by time.
+
+    A tide above both neighbours is high and below both is low; the first and
+    last tides compare with their one neighbour. Tides level with a neighbour
+    (plateaus, where the turning point is ambiguous) and steps in a monotonic
+    run fall back to `threshold` in metres, defaulting to the median height.
+    """
+    h = table.height_mm.astype(np.int32)
+    n = len(h)
+    if n == 0:
+        return table
+    if threshold is None:
+        threshold = float(np.median(h)) / 1000
+
+    prev = np.r_[h[:1], h[:-1]]
+    nxt = np.r_[h[1:], h[-1:]]
+    first = np.arange(n) == 0
+    last = np.arange(n) == n - 1
+    paired = n > 1
+
+    above = ((h > prev) | first) & ((h > nxt) | last) & paired
+    below = ((h < prev) | first) & ((h < nxt) | last) & paired
+    high = above | (~below & (h > threshold * 1000))
+
+    table.kind[:] = np.where(high, TIDE_TYPES.index('high'), TIDE_TYPES.index('low'))
+    return table
+
+
+def classify_tides(tides, threshold=None):
+    """Sort dicts with 'date', 'time' and 'height' by time and set each one's 'type'."""
     tides.sort(key=lambda x: (x['date'], x['time']))
-    
-    for i in range(len(tides)):
-        prev_h = tides[i-1]['height'] if i > 0 else tides[i]['height']
-        next_h = tides[i+1]['height'] if i < len(tides)-1 else tides[i]['height']
-        curr = tides[i]['height']
-        
-        if curr > prev_h and curr > next_h:
-            tides[i]['type'] = 'high'
-        elif curr < prev_h and curr < next_h:
-            tides[i]['type'] = 'low'
-        elif curr > 0.8:
-            tides[i]['type'] = 'high'
-        else:
-            tides[i]['type'] = 'low'
-    
+    table = classify_table(TideTable.from_entries(tides), threshold)
+    for tide, kind in zip(tides, table.kind.tolist()):
+        tide['type'] = TIDE_TYPES[kind]
     return tides
 
 
-def validate_data(tides):
+def encode_binary(table):
+    """Pack a sorted, classified TideTable into the compact binary format.
+
+    Times are stored as the first tide's minutes since EPOCH plus uint16
+    deltas (the first delta is 0), heights are rounded to centimetres.
+    Every section starts on an even offset so it maps onto a JS typed array.
+    """
+    n = len(table)
+    start = int(table.minutes[0]) if n else 0
+    deltas = np.diff(table.minutes.astype(np.int64), prepend=start)
+    if n and (deltas.min() < 0 or deltas.max() > 0xFFFF):
+        raise ValueError("tides must be sorted and no more than 45 days apart")
+    heights_cm = np.round(table.height_mm / 10).astype('<i2')
+    high = np.packbits(table.kind == TIDE_TYPES.index('high'), bitorder='little')
+    return b''.join([
+        BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, 0, n, start),
+        deltas.astype('<u2').tobytes(),
+        heights_cm.tobytes(),
+        high.tobytes(),
+    ])
+
+
+def decode_binary(data):
+    """Inverse of encode_binary()."""
+    magic, version, _, _, n, start = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("not a version 1 tide file")
+    offset = BINARY_HEADER.size
+    deltas = np.frombuffer(data, '<u2', n, offset)
+    heights_cm = np.frombuffer(data, '<i2', n, offset + 2 * n)
+    high = np.unpackbits(np.frombuffer(data, np.uint8, (n + 7) // 8, offset + 4 * n),
+                         count=n, bitorder='little')
+    kind = np.where(high, TIDE_TYPES.index('high'), TIDE_TYPES.index('low'))
+    return TideTable(start + np.cumsum(deltas, dtype=np.int64), heights_cm.astype(np.int16) * 10, kind)
+
+
+def binary_path(json_path):
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def shard_dir(json_path):
+    """Directory of per-month shards for an output, named after its file."""
+    return os.path.splitext(json_path)[0]
+
+
+def write_month_shards(table, loc, year):
+    """Write <shard_dir>/YYYY-MM.json per month plus a manifest.json listing them.
+
+    The manifest gives each month's file, tide count and height range so the
+    page can draw the current month first and fetch the rest lazily.
+    """
+    directory = shard_dir(loc['output'])
+    os.makedirs(directory, exist_ok=True)
+
+    months = table.datetimes().astype('datetime64[M]')
+    bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True]) if len(months) else []
+    entries = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        month = str(months[lo])
+        shard = table[lo:hi]
+        filename = f"{month}.json"
+        with open(os.path.join(directory, filename), 'w') as f:
+            json.dump({"month": month, "tides": shard.to_records()}, f, separators=(',', ':'))
+        heights = shard.heights
+        entries.append({
+            "month": month,
+            "file": filename,
+            "count": len(shard),
+            "min_height": float(heights.min()),
+            "max_height": float(heights.max()),
+        })
+
+    with open(os.path.join(directory, "manifest.json"), 'w') as f:
+        json.dump({
+            "location": loc['name'],
+            "year": year,
+            "source": "Bureau of Meteorology",
+            "months": entries
+        }, f, indent=2)
+
+
+def location_outputs(loc):
+    """Every file written for a location (month shards are covered by their manifest)."""
+    return [loc['output'], binary_path(loc['output']),
+            os.path.join(shard_dir(loc['output']), "manifest.json")]
+
+
+def validate_table(table, start=None, end=None):
+    """Check a sorted TideTable covers every day in [start, end) sensibly.
+
+    `start` and `end` are dates and default to the whole calendar years the
+    tides fall in. Reports missing days, days with a tide count outside
+    TIDES_PER_DAY, tides outside the span and gaps longer than MAX_GAP_HOURS.
+    """
+    if len(table) == 0:
+        return ["No tides"]
+
+    stamps = table.datetimes()
+    if start is None:
+        start = stamps[0].astype('datetime64[Y]')
+    if end is None:
+        end = stamps[-1].astype('datetime64[Y]') + 1
+    first_day = np.datetime64(start, 'D')
+    n_days = int((np.datetime64(end, 'D') - first_day) // np.timedelta64(1, 'D'))
+
     issues = []
-    
-    unique_days = sorted(set(t['date'] for t in tides))
-    if len(unique_days) != 365:
-        issues.append(f"Day count: {len(unique_days)}/365")
-        
-        expected = set()
-        d = date(YEAR, 1, 1)
-        while d.year == YEAR:
-            expected.add(d.isoformat())
-            try:
-                d = d.replace(day=d.day + 1)
-            except ValueError:
-                if d.month == 12:
-                    break
-                d = d.replace(month=d.month+1, day=1)
-        
-        missing = expected - set(unique_days)
-        if missing:
-            issues.append(f"Missing: {sorted(missing)[:3]}...")
-
-    day_counts = defaultdict(int)
-    for t in tides:
-        day_counts[t['date']] += 1
-    
-    suspicious = [d for d, c in day_counts.items() if c < 1 or c > 4]
-    if suspicious:
-        issues.append(f"Suspicious counts on {len(suspicious)} days")
+    day = (stamps.astype('datetime64[D]') - first_day).astype(np.int64)
+    inside = (day >= 0) & (day < n_days)
+    if not inside.all():
+        issues.append(f"{int((~inside).sum())} tides outside {first_day}..{np.datetime64(end, 'D')}")
+
+    counts = np.bincount(day[inside], minlength=n_days)
+    covered = counts > 0
+    if not covered.all():
+        issues.append(f"Day count: {int(covered.sum())}/{n_days}")
+        missing = first_day + np.flatnonzero(~covered)[:3]
+        issues.append(f"Missing: {np.datetime_as_string(missing).tolist()}...")
+
+    low, high = TIDES_PER_DAY
+    suspicious = covered & ((counts < low) | (counts > high))
+    if suspicious.any():
+        issues.append(f"Suspicious counts on {int(suspicious.sum())} days")
+
+    gaps = np.diff(table.minutes)
+    long_gaps = np.flatnonzero(gaps > MAX_GAP_HOURS * 60)
+    if len(long_gaps):
+        issues.append(f"{len(long_gaps)} gaps over {MAX_GAP_HOURS}h, first after "
+                      f"{np.datetime_as_string(stamps[long_gaps[0]])}")
 
     return issues
 
 
-def main():
-    for loc in LOCATIONS:
-        print(f"\n--- {loc['name']} ---")
-        try:
-            raw = extract_all(loc['pdf'])
-            print(f"Extracted {len(raw)} entries")
-            
-            unique = {}
-            for entry in raw:
-                unique[f"{entry['date']}_{entry['time']}"] = entry
-            
-            data = classify_tides(list(unique.values()))
-            issues = validate_data(data)
-            
-            if issues:
-                print(f"⚠️  Issues: {', '.join(issues)}")
+def validate_data(tides):
+    """validate_table() for dicts with 'date', 'time' and 'height', over the calendar year(s) they cover."""
+    return validate_table(TideTable.from_entries(tides).sort())
+
+
+def process_location(loc, opts=None):
+    raw = []
+    unexpected = 0
+    for entries, skipped in iter_pages(loc['pdf'], opts, loc.get('year', YEAR)):
+        raw.extend(entries)
+        unexpected += skipped
+    return finish_location(loc, raw, unexpected)
+
+
+def finish_location(loc, raw, unexpected=0):
+    """Deduplicate, classify, validate and write one location. Returns a summary dict."""
+    with stage("dedupe"):
+        table = TideTable.from_entries(raw).unique()
+    with stage("classify_tides"):
+        table = classify_table(table, loc.get('threshold'))
+    year = loc.get('year', YEAR)
+    with stage("validate_data"):
+        issues = validate_table(table, date(year, 1, 1), date(year + 1, 1, 1))
+
+    with stage("json_dump"):
+        with open(loc['output'], 'w') as f:
+            json.dump({
+                "location": loc['name'],
+                "year": year,
+                "source": "Bureau of Meteorology",
+                "extracted": datetime.now().isoformat(),
+                "tides": table.to_records()
+            }, f, indent=2)
+    with stage("binary"):
+        with open(binary_path(loc['output']), 'wb') as f:
+            f.write(encode_binary(table))
+    with stage("shards"):
+        write_month_shards(table, loc, year)
+
+    return {"extracted": len(raw), "unexpected": unexpected, "issues": issues}
+
+
+def classify_window(chunk, before, after, threshold=None):
+    """classify_table() on `chunk` using the tides either side of it as neighbours."""
+    window = TideTable.concat([before, chunk, after])
+    classify_table(window, threshold)
+    return window[len(before):len(before) + len(chunk)]
+
+
+def stream_location(loc, opts=None, pool=None, issues=None):
+    """Yield one location's tide records page by page, keeping only a page in memory.
+
+    After each page, every month before the last one seen so far (three or
+    four months per BOM page) is classified, validated and yielded as one
+    chunk. The last month waits for the first tide of a later month, since
+    that is its last tide's neighbour, or for the end of the table. Problems,
+    including any unexpected tokens, are appended to `issues`, labelled with
+    their chunk's months. Without a catalogue threshold the fallback is the
+    median of each chunk rather than of the whole year.
+    """
+    issues = [] if issues is None else issues
+    year = loc.get('year', YEAR)
+    threshold = loc.get('threshold')
+    before = buffer = TideTable()
+    months_seen = 0
+    unexpected = 0
+
+    def flush(chunk, after):
+        nonlocal months_seen
+        chunk = classify_window(chunk, before, after, threshold)
+        months = chunk.datetimes().astype('datetime64[M]')
+        months_seen += len(np.unique(months))
+        issues.extend(f"{months[0]}..{months[-1]} {issue}"
+                      for issue in validate_table(chunk, months[0], months[-1] + 1))
+        return chunk
+
+    for entries, skipped in iter_pages(loc['pdf'], opts, year, pool):
+        unexpected += skipped
+        buffer = TideTable.concat([buffer, TideTable.from_entries(entries)]).unique()
+        if not len(buffer):
+            continue
+        months = buffer.datetimes().astype('datetime64[M]')
+        cut = int(np.searchsorted(months, months[-1]))
+        if cut:
+            chunk = flush(buffer[:cut], buffer[cut:cut + 1])
+            yield from chunk.to_records()
+            before, buffer = chunk[-1:], buffer[cut:]
+
+    if len(buffer):
+        yield from flush(buffer, TideTable()).to_records()
+    if months_seen != 12:
+        issues.append(f"Month count: {months_seen}/12 for {year}")
+    if unexpected:
+        issues.append(f"{unexpected} unexpected tokens")
+
+
+def stream_ndjson(locations, out, jobs=1, opts=None):
+    """Write every tide of every location to `out` as one JSON object per line."""
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        for loc in locations:
+            issues = []
+            count = 0
+            try:
+                for record in stream_location(loc, opts, pool, issues):
+                    out.write(json.dumps({"station": loc['code'], **record}, separators=(',', ':')) + "\n")
+                    count += 1
+                out.flush()
+            except Exception as e:
+                report(loc, None, e)
+                continue
+            report(loc, {"extracted": count, "issues": issues, "output": "stdout"}, None)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def run_locations(locations, jobs=1, opts=None):
+    """Process locations, with every page of every PDF in one process pool when jobs > 1.
+
+    Yields (loc, result, error) in the order of `locations`, so one station
+    failing never discards the others. With opts['profile'], each result
+    carries a 'profile' of its stage timings.
+    """
+    profiles = [Profile() if (opts or {}).get('profile') else None for _ in locations]
+
+    if jobs <= 1:
+        for loc, profile in zip(locations, profiles):
+            try:
+                with profiling(profile):
+                    result = process_location(loc, opts)
+            except Exception as e:
+                yield loc, None, e
+                continue
+            if profile is not None:
+                result['profile'] = profile.to_dict()
+            yield loc, result, None
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = []
+        for loc, profile in zip(locations, profiles):
+            try:
+                with profiling(profile):
+                    pending.append(submit_pages(pool, loc['pdf'], opts, loc.get('year', YEAR)))
+            except Exception as e:
+                pending.append(e)
+        for loc, futures, profile in zip(locations, pending, profiles):
+            if isinstance(futures, Exception):
+                yield loc, None, futures
+                continue
+            try:
+                with profiling(profile):
+                    result = finish_location(loc, *merge_pages(futures))
+            except Exception as e:
+                yield loc, None, e
+                continue
+            if profile is not None:
+                result['profile'] = profile.to_dict()
+            yield loc, result, None
+
+
+def load_catalogue(path=CATALOGUE_FILE):
+    with open(path) as f:
+        return {station['code']: station for station in json.load(f)}
+
+
+def output_path(station, code, year, output_dir=".", store=None):
+    """Where a station-year is written.
+
+    With a `store` directory, every station-year goes to <store>/<code>/<year>.json.
+    Otherwise YEAR uses the catalogue's file name (what the page loads) and
+    other years get a _<year> suffix on it.
+    """
+    if store:
+        return os.path.join(store, code, f"{year}.json")
+    name = station.get('output', f"tides_{code.lower()}.json")
+    if year != YEAR:
+        stem, ext = os.path.splitext(name)
+        name = f"{stem}_{year}{ext}"
+    return os.path.normpath(os.path.join(output_dir, name))
+
+
+def discover_locations(input_dir=".", output_dir=".", catalogue=None, years=None, store=None):
+    """Build a location for every IDO59001_<year>_WA_TPxxx.pdf in `input_dir`.
+
+    Names come from the catalogue; stations missing from it fall back to their
+    code. `years` restricts which years are picked up (default: all).
+    """
+    if catalogue is None:
+        catalogue = load_catalogue()
+    locations = []
+    for filename in sorted(os.listdir(input_dir)):
+        match = PDF_PATTERN.fullmatch(filename)
+        if not match:
+            continue
+        year, code = int(match.group(1)), match.group(2)
+        if years is not None and year not in years:
+            continue
+        station = catalogue.get(code, {})
+        locations.append({
+            "code": code,
+            "name": station.get('name', code),
+            "year": year,
+            "pdf": os.path.normpath(os.path.join(input_dir, filename)),
+            "output": output_path(station, code, year, output_dir, store),
+        })
+        if 'threshold' in station:
+            locations[-1]['threshold'] = station['threshold']
+    return locations
+
+
+def write_index(locations, output_dir="."):
+    """Update the cross-year index: each station's output file for every year, relative to the index.
+
+    Years already listed for other runs are kept, so processing a subset of
+    years never drops the rest.
+    """
+    path = os.path.join(output_dir, INDEX_FILE)
+    try:
+        with open(path) as f:
+            stations = {s['code']: s for s in json.load(f)['stations']}
+    except (OSError, ValueError, KeyError):
+        stations = {}
+
+    for loc in locations:
+        station = stations.setdefault(loc['code'], {"code": loc['code'], "name": loc['name'], "years": {}})
+        station['name'] = loc['name']
+        station['years'][str(loc['year'])] = os.path.relpath(loc['output'], output_dir)
+    stations = {code: {**s, "years": dict(sorted(s['years'].items()))} for code, s in sorted(stations.items())}
+
+    with open(path, 'w') as f:
+        json.dump({
+            "source": "Bureau of Meteorology",
+            "stations": list(stations.values())
+        }, f, indent=2)
+    return path
+
+
+def read_index(output_dir=".", years=None):
+    """Locations listed in `output_dir`'s index, so built outputs can be read without their PDFs.
+
+    Each has 'code', 'name', 'year' and 'output'. `years` restricts which
+    years are returned (default: all).
+    """
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE)) as f:
+            stations = json.load(f)['stations']
+    except (OSError, ValueError, KeyError):
+        return []
+    return [{"code": s['code'], "name": s['name'], "year": int(year), "output": os.path.join(output_dir, path)}
+            for s in stations for year, path in s['years'].items()
+            if years is None or int(year) in years]
+
+
+def parse_years(text):
+    """'2024-2030' or '2025,2026' -> set of years."""
+    years = set()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        years.update(range(int(first), int(last or first) + 1))
+    return years
+
+
+def load_location_table(loc):
+    """Read back a built location's tides from its binary output."""
+    with open(binary_path(loc['output']), 'rb') as f:
+        return decode_binary(f.read())
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tides (
+    station TEXT NOT NULL,
+    minute INTEGER NOT NULL,     -- local minutes since 1970-01-01 (UTC+08:00)
+    height_mm INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (station, minute)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tides_by_type_height ON tides (station, type, height_mm);
+"""
+
+
+def export_sqlite(locations, db_path):
+    """Load every location's tides from its binary output into SQLite in one transaction.
+
+    Each station-year's existing rows are replaced, so re-exporting is idempotent.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executescript(SQLITE_SCHEMA)
+            for loc in locations:
+                table = load_location_table(loc)
+                year = loc.get('year', YEAR)
+                conn.execute("INSERT OR REPLACE INTO stations VALUES (?, ?)", (loc['code'], loc['name']))
+                conn.execute("DELETE FROM tides WHERE station = ? AND minute >= ? AND minute < ?",
+                             (loc['code'], to_minutes(date(year, 1, 1)), to_minutes(date(year + 1, 1, 1))))
+                conn.executemany("INSERT OR REPLACE INTO tides VALUES (?, ?, ?, ?)", zip(
+                    [loc['code']] * len(table),
+                    table.minutes.tolist(),
+                    table.height_mm.tolist(),
+                    [TIDE_TYPES[k] for k in table.kind.tolist()],
+                ))
+    finally:
+        conn.close()
+
+
+def query_tides(db_path, station=None, kind=None, min_height=None, max_height=None,
+                start=None, end=None, weekdays=None, time_from=None, time_to=None):
+    """Tides matching every given filter, as dicts ordered by station and time.
+
+    `station` is a code or name; heights are metres; `start`/`end` are dates or
+    datetimes (end exclusive); `weekdays` are 0 (Monday) to 6; `time_from` and
+    `time_to` are 'HH:MM' bounds on the time of day, inclusive.
+    """
+    where, params = [], []
+    if station is not None:
+        where.append("t.station = (SELECT code FROM stations WHERE code = ? OR name = ?)")
+        params += [station, station]
+    if kind is not None:
+        where.append("t.type = ?")
+        params.append(kind)
+    if min_height is not None:
+        where.append("t.height_mm >= ?")
+        params.append(round(min_height * 1000))
+    if max_height is not None:
+        where.append("t.height_mm <= ?")
+        params.append(round(max_height * 1000))
+    if start is not None:
+        where.append("t.minute >= ?")
+        params.append(to_minutes(start))
+    if end is not None:
+        where.append("t.minute < ?")
+        params.append(to_minutes(end))
+    if weekdays is not None:
+        # 1970-01-01 was a Thursday (weekday 3).
+        where.append(f"(t.minute / 1440 + 3) % 7 IN ({', '.join('?' * len(weekdays))})")
+        params += list(weekdays)
+    if time_from is not None:
+        where.append("t.minute % 1440 >= ?")
+        params.append(int(time_from[:2]) * 60 + int(time_from[3:]))
+    if time_to is not None:
+        where.append("t.minute % 1440 <= ?")
+        params.append(int(time_to[:2]) * 60 + int(time_to[3:]))
+
+    sql = "SELECT s.name, t.minute, t.height_mm, t.type FROM tides t JOIN stations s ON s.code = t.station"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY t.station, t.minute"
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    stamps = np.datetime_as_string(np.datetime64(EPOCH, 'm') + np.array([r[1] for r in rows], dtype='timedelta64[m]'))
+    return [{'location': name, 'date': stamp[:10], 'time': stamp[11:], 'height': height_mm / 1000, 'type': kind}
+            for (name, _, height_mm, kind), stamp in zip(rows, stamps.tolist())]
+
+
+def export_parquet(locations, root):
+    """Write <root>/station=<code>/year=<year>/tides.parquet for every location.
+
+    Times are timestamps in UTC+08:00, heights float32 metres and type
+    dictionary-encoded. Station and year live in the hive-style directory
+    names, so pyarrow or pandas read the whole tree as one dataset with them
+    as dictionary columns.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("ERROR: pyarrow required for --parquet. Run: pip install pyarrow")
+        sys.exit(1)
+
+    offset_s = 8 * 3600
+    for loc in locations:
+        table = load_location_table(loc)
+        year = loc.get('year', YEAR)
+        seconds = table.minutes.astype(np.int64) * 60 - offset_s
+        arrow = pa.table({
+            "time": pa.array(seconds, pa.timestamp('s', tz="+08:00")),
+            "height": pa.array(table.heights.astype(np.float32)),
+            "type": pa.DictionaryArray.from_arrays(
+                pa.array(table.kind.astype(np.int8) - 1), pa.array(TIDE_TYPES[1:])),
+        })
+        directory = os.path.join(root, f"station={loc['code']}", f"year={year}")
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(arrow, os.path.join(directory, "tides.parquet"))
+
+
+def cosine_segments(table):
+    """(t0, t1, h0, h1) arrays for each pair of consecutive turning points.
+
+    Between a high and a low the water level follows half a cosine:
+    h(t) = h0 + (h1 - h0) * (1 - cos(pi * (t - t0) / (t1 - t0))) / 2.
+    Times are minutes since EPOCH, heights millimetres, all float64.
+    """
+    t = table.minutes.astype(np.float64)
+    h = table.height_mm.astype(np.float64)
+    return t[:-1], t[1:], h[:-1], h[1:]
+
+
+def tide_curve(table, start, end, step=1):
+    """Water level every `step` minutes over [start, end), by cosine interpolation.
+
+    `table` holds classified turning points (as from classify_table()).
+    Returns (times, heights): datetime64[m] local times and float32 metres,
+    NaN outside the first to last tide. A year per minute is ~525k samples,
+    about 6 MB for both arrays.
+    """
+    table = table.sort()
+    samples = np.arange(to_minutes(start), to_minutes(end), step, dtype=np.int64)
+    heights = np.full(len(samples), np.nan, dtype=np.float32)
+
+    t0, t1, h0, h1 = cosine_segments(table)
+    if len(t0):
+        seg = np.searchsorted(t1, samples, side='left')
+        inside = (samples >= t0[0]) & (seg < len(t0))
+        seg = seg[inside]
+        phase = (samples[inside] - t0[seg]) / (t1[seg] - t0[seg])
+        heights[inside] = (h0[seg] + (h1[seg] - h0[seg]) * (1 - np.cos(np.pi * phase)) / 2) / 1000
+
+    return np.datetime64(EPOCH, 'm') + samples.astype('timedelta64[m]'), heights
+
+
+def iter_tide_curve(table, start, end, step=1, chunk_days=7):
+    """tide_curve() in consecutive chunks of `chunk_days`, for ranges too long to hold at once."""
+    table = table.sort()
+    lo, hi = to_minutes(start), to_minutes(end)
+    width = chunk_days * 1440 // step * step
+    base = datetime(EPOCH.year, EPOCH.month, EPOCH.day)
+    for chunk_start in range(lo, hi, width):
+        chunk_end = min(chunk_start + width, hi)
+        yield tide_curve(table, base + timedelta(minutes=chunk_start), base + timedelta(minutes=chunk_end), step)
+
+
+class TideWindowIndex:
+    """Crossing times of the interpolated water level for evenly spaced height levels.
+
+    For each level, `times[offsets[i]:offsets[i + 1]]` are the sorted moments
+    the cosine-interpolated curve crosses `levels[i]`, alternating rising and
+    falling. A height band query reads two such arrays, so locating a date
+    range costs O(log n) and the rest is proportional to the windows returned.
+    """
+
+    def __init__(self, table, step_mm=10):
+        if step_mm < 1:
+            raise ValueError(f"level spacing must be at least 1 mm, got {step_mm}")
+        table = table.sort()
+        self.step_mm = step_mm
+        if not len(table):
+            self.levels = np.zeros(0, dtype=np.int64)
+            self.first_height = 0
+            self.span = (0.0, 0.0)
+            self.times = np.zeros(0)
+            self.rising = np.zeros(0, dtype=bool)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+        t0, t1, h0, h1 = cosine_segments(table)
+        h = table.height_mm
+        self.levels = np.arange(h.min() // step_mm * step_mm, h.max() + step_mm, step_mm, dtype=np.int64)
+        self.first_height = int(h[0])
+        self.span = (float(table.minutes[0]), float(table.minutes[-1]))
+
+        # Each segment crosses every level in (min(h0, h1), max(h0, h1)].
+        lo = np.searchsorted(self.levels, np.minimum(h0, h1), side='right')
+        hi = np.searchsorted(self.levels, np.maximum(h0, h1), side='right')
+        counts = hi - lo
+        seg = np.repeat(np.arange(len(t0)), counts)
+        level = lo[seg] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        frac = (self.levels[level] - h0[seg]) / (h1[seg] - h0[seg])
+        times = t0[seg] + np.arccos(1 - 2 * frac) / np.pi * (t1[seg] - t0[seg])
+        order = np.lexsort((times, level))
+        self.times = times[order]
+        self.rising = (h1 > h0)[seg][order]
+        self.offsets = np.r_[0, np.cumsum(np.bincount(level, minlength=len(self.levels)))]
+
+    def _intervals(self, i, above, start, end):
+        """Intervals within [start, end) where the level is >= (above) or < levels[i]."""
+        times = self.times[self.offsets[i]:self.offsets[i + 1]]
+        rising = self.rising[self.offsets[i]:self.offsets[i + 1]]
+        k = int(np.searchsorted(times, start, side='right'))
+        inside = bool(rising[k - 1]) if k else self.first_height >= self.levels[i]
+        inside = inside == above
+
+        intervals = []
+        opened = start if inside else None
+        for t in times[k:np.searchsorted(times, end)].tolist():
+            if opened is None:
+                opened = t
             else:
-                print("✓ Valid")
-
-            with open(loc['output'], 'w') as f:
-                json.dump({
-                    "location": loc['name'],
-                    "year": YEAR,
-                    "source": "Bureau of Meteorology",
-                    "extracted": datetime.now().isoformat(),
-                    "tides": data
-                }, f, indent=2)
-            print(f"→ {loc['output']}")
-            
-        except Exception as e:
-            print(f"✗ Failed: {e}")
+                if t > opened:
+                    intervals.append((opened, t))
+                opened = None
+        if opened is not None and end > opened:
+            intervals.append((opened, end))
+        return intervals
+
+    def windows(self, min_height, max_height, time_from="00:00", time_to="24:00", start=None, end=None):
+        """(start, end) datetime pairs when the water is within the height band during the daily hours.
+
+        Heights are metres, rounded inward to the index's level spacing.
+        When `time_to` is earlier than `time_from` the hours wrap past midnight,
+        e.g. 22:00-02:00. `start`/`end` are dates or datetimes limiting the search.
+        """
+        tod_lo = int(time_from[:2]) * 60 + int(time_from[3:])
+        tod_hi = int(time_to[:2]) * 60 + int(time_to[3:])
+        if not (0 <= tod_lo <= 1440 and 0 <= tod_hi <= 1440) or tod_lo == tod_hi:
+            raise ValueError(f"bad daily hours {time_from}-{time_to}")
+        if tod_hi < tod_lo:
+            tod_hi += 1440
+
+        lo = int(np.searchsorted(self.levels, min_height * 1000, side='left'))
+        hi = int(np.searchsorted(self.levels, max_height * 1000, side='right')) - 1
+        t_start = max(self.span[0], to_minutes(start) if start is not None else -np.inf)
+        t_end = min(self.span[1], to_minutes(end) if end is not None else np.inf)
+        if lo > hi or hi < 0 or lo >= len(self.levels) or t_start >= t_end:
+            return []
+
+        above = self._intervals(lo, True, t_start, t_end)
+        below = self._intervals(hi, False, t_start, t_end)
+        # Clip each band interval to the daily hours of only the days it touches;
+        # a window wrapping past midnight may start on the day before.
+        out = []
+        for a, b in intersect_intervals(above, below):
+            for day in range(int((a - tod_hi) // 1440) + 1, int(b // 1440) + 1):
+                lo = max(a, day * 1440 + tod_lo)
+                hi = min(b, day * 1440 + tod_hi)
+                if round(hi) > round(lo):
+                    out.append((lo, hi))
+
+        base = datetime(EPOCH.year, EPOCH.month, EPOCH.day)
+        return [(base + timedelta(minutes=round(a)), base + timedelta(minutes=round(b))) for a, b in out]
+
+
+def intersect_intervals(a, b):
+    """Intersection of two sorted lists of disjoint (start, end) intervals."""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        lo = max(a[i][0], b[j][0])
+        hi = min(a[i][1], b[j][1])
+        if lo < hi:
+            out.append((lo, hi))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def parse_span(text):
+    """'0.2-0.5' or '07:00-17:00' -> (low, high) strings; a leading minus sign is allowed."""
+    cut = text.index('-', 1)
+    return text[:cut], text[cut + 1:]
+
+
+def windows_main(args):
+    output_dir = args.store or args.output_dir
+    locations = [loc for loc in read_index(output_dir, args.years)
+                 if args.station in (loc['code'], loc['name']) and os.path.exists(binary_path(loc['output']))]
+    if not locations:
+        print(f"No built tides for {args.station}; run the extractor first")
+        sys.exit(1)
+
+    table = TideTable.concat(load_location_table(loc) for loc in locations)
+    index = TideWindowIndex(table, round(args.step * 10))
+    min_height, max_height = (float(v) for v in parse_span(args.height))
+    time_from, time_to = parse_span(args.time)
+    start = date.fromisoformat(args.start) if args.start else None
+    end = date.fromisoformat(args.end) if args.end else None
+
+    for a, b in index.windows(min_height, max_height, time_from, time_to, start, end):
+        print(f"{a:%Y-%m-%d %a %H:%M} – {b:%H:%M}" if a.date() == b.date() else f"{a:%Y-%m-%d %H:%M} – {b:%Y-%m-%d %H:%M}")
+
+
+def file_state(path, previous=None):
+    """Hash `path`, reusing `previous` when its recorded size and mtime still match."""
+    st = os.stat(path)
+    stat = [st.st_size, st.st_mtime_ns]
+    if previous and previous.get('stat') == stat:
+        return previous
+    return {"sha256": file_sha256(path), "stat": stat}
+
+
+def config_digest(loc, opts=None):
+    """Hash of this script (parsing rules, ranges, page map), the location's settings and OUTPUT_OPTIONS."""
+    opts = {**DEFAULT_OPTIONS, **(opts or {})}
+    h = hashlib.sha256()
+    with open(os.path.abspath(__file__), 'rb') as f:
+        h.update(f.read())
+    h.update(json.dumps(loc, sort_keys=True).encode())
+    h.update(json.dumps({k: opts[k] for k in OUTPUT_OPTIONS}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def plan_build(locations, manifest, force=False, opts=None):
+    """Split locations into (stale, current) and return the input state for each.
+
+    A location is current when its PDF, this script, the OUTPUT_OPTIONS in
+    `opts` and its outputs all hash to the values recorded in the manifest.
+    """
+    config = {}
+    stale, current = [], []
+    for loc in locations:
+        entry = manifest.get(loc['output'], {})
+        try:
+            pdf = file_state(loc['pdf'], entry.get('pdf'))
+        except OSError:
+            stale.append(loc)
+            continue
+        config[loc['output']] = {"pdf": pdf, "config": config_digest(loc, opts)}
+        try:
+            up_to_date = (
+                not force
+                and entry.get('pdf', {}).get('sha256') == pdf['sha256']
+                and entry.get('config') == config[loc['output']]['config']
+                and all(file_state(path, entry.get('outputs', {}).get(path)) == entry.get('outputs', {}).get(path)
+                        for path in location_outputs(loc))
+            )
+        except OSError:
+            up_to_date = False
+        (current if up_to_date else stale).append(loc)
+    return stale, current, config
+
+
+def report(loc, result, error):
+    print(f"\n--- {loc['name']} ---")
+    if error is not None:
+        print(f"✗ Failed: {error}")
+        return
+    print(f"Extracted {result['extracted']} entries")
+    if result.get('unexpected'):
+        print(f"⚠️  Skipped {result['unexpected']} unexpected tokens")
+    if result['issues']:
+        print(f"⚠️  Issues: {', '.join(result['issues'])}")
+    else:
+        print("✓ Valid")
+    print(f"→ {result.get('output', loc['output'])}")
+
+
+def write_profile(loc, report, profile_dir, opts):
+    """Write one location's stage timings to `profile_dir`/<code>_<year>.json."""
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{loc['code']}_{loc.get('year', YEAR)}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            "station": loc['code'],
+            "name": loc['name'],
+            "year": loc.get('year', YEAR),
+            "pdf": loc['pdf'],
+            "backend": opts['backend'],
+            "layout": opts['layout'],
+            "cached": bool(opts['cache_dir']),
+            **report,
+        }, f, indent=2)
+    return path
+
+
+def print_profile(stages):
+    """Print a table of stage timings, slowest wall time first."""
+    print(f"\n{'stage':<22}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak KB':>10}")
+    for name, t in sorted(stages.items(), key=lambda item: -item[1]['wall_s']):
+        print(f"{name:<22}{t['calls']:>7}{t['wall_s']:>10.3f}{t['cpu_s']:>10.3f}{t['peak_kb']:>10.0f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes; 0 uses every core (default: 1)")
+    parser.add_argument("--input-dir", default=".",
+                        help="directory of IDO59001_<year>_WA_TPxxx.pdf files (default: .)")
+    parser.add_argument("--output-dir", default=".",
+                        help="directory for tides_*.json and the index (default: .)")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json",
+                        help="'ndjson' streams one tide per line to stdout, with progress on stderr")
+    parser.add_argument("--sqlite", metavar="DB",
+                        help="also load every station's tides into this SQLite database")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="also write a station/year partitioned Parquet dataset (needs pyarrow)")
+    parser.add_argument("--years", type=parse_years,
+                        help="years to process, e.g. 2024-2030 or 2025,2026 (default: all found)")
+    parser.add_argument("--store",
+                        help="write <store>/<code>/<year>.json and <store>/" + INDEX_FILE + " instead")
+    parser.add_argument("--catalogue", default=CATALOGUE_FILE,
+                        help="station catalogue JSON (default: %(default)s)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pdfplumber",
+                        help="word extraction backend; 'fast' reads the raw char stream")
+    parser.add_argument("--layout", choices=LAYOUT_MODES, default=DEFAULT_OPTIONS['layout'],
+                        help="infer column bands and page months from each PDF, or use the constants")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="page word cache directory (default: %(default)s)")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_BYTES / 2**20,
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always re-parse PDFs (ignore the word cache)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every location, even if its inputs are unchanged")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild stations whose PDFs are added or replaced")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE, metavar="SECONDS",
+                        help="with --watch, wait until the PDFs have been unchanged this long "
+                             "(default: %(default)s)")
+    parser.add_argument("--profile", nargs="?", const="profile", metavar="DIR",
+                        help="write per-stage, per-page timings for each location to DIR "
+                             "(default: profile) and print a batch summary")
+
+    commands = parser.add_subparsers(dest="command")
+    windows = commands.add_parser("windows", help="list times the water is within a height band")
+    windows.add_argument("station", help="station code or name, e.g. TP015 or Fremantle")
+    windows.add_argument("--height", required=True, help="height band in metres, e.g. 0.2-0.5")
+    windows.add_argument("--time", default="00:00-24:00", help="daily hours, e.g. 07:00-17:00")
+    windows.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    windows.add_argument("--to", dest="end", help="end date (exclusive), YYYY-MM-DD")
+    windows.add_argument("--step", type=float, default=1,
+                         help="height level spacing in centimetres (default: 1)")
+    args = parser.parse_args(argv)
+    if args.command == "windows" and round(args.step * 10) < 1:
+        parser.error("--step must be at least 0.1 (one millimetre)")
+    if args.watch and args.format == "ndjson":
+        parser.error("--watch writes files and cannot be combined with --format ndjson")
+    return args
+
+
+def snapshot_pdfs(input_dir):
+    """{filename: (size, mtime_ns)} for every tide table PDF in `input_dir`."""
+    state = {}
+    for entry in os.scandir(input_dir):
+        if PDF_PATTERN.fullmatch(entry.name):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            state[entry.name] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def watch(input_dir, rebuild, debounce=WATCH_DEBOUNCE):
+    """Call rebuild() each time the PDFs in `input_dir` change and then stay still for `debounce` seconds.
+
+    Polls rather than relying on OS file events, so it behaves the same on
+    every platform and on network shares. A PDF still being copied keeps
+    changing size, which holds off the rebuild until it is complete.
+    """
+    try:
+        load_pdf_parsers()  # forked page workers inherit the loaded parsers
+    except ImportError:
+        pass
+    seen = snapshot_pdfs(input_dir)
+    changed_at = None
+    print(f"\nWatching {input_dir} for new or updated PDFs (Ctrl-C to stop)...")
+    try:
+        while True:
+            time.sleep(debounce / 4)
+            state = snapshot_pdfs(input_dir)
+            if state != seen:
+                seen, changed_at = state, time.monotonic()
+            elif changed_at is not None and time.monotonic() - changed_at >= debounce:
+                changed_at = None
+                try:
+                    rebuild()
+                except Exception as e:
+                    print(f"✗ Rebuild failed: {e}")
+                print(f"\nWatching {input_dir}...")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+
+def build(args, opts, jobs, force=False):
+    """Extract every stale location found in args.input_dir, then write the index and exports."""
+    cache_dir = opts['cache_dir']
+    output_dir = args.store or args.output_dir
+    locations = discover_locations(args.input_dir, output_dir, load_catalogue(args.catalogue),
+                                   args.years, args.store)
+    if not locations:
+        print(f"No IDO59001_<year>_WA_TPxxx.pdf files in {args.input_dir}")
+        return
+
+    for loc in locations:
+        os.makedirs(os.path.dirname(loc['output']) or ".", exist_ok=True)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    stale, current, inputs = plan_build(locations, manifest, force, opts)
+    for loc in current:
+        print(f"= {loc['name']} up to date")
+
+    batch = Profile()
+    if args.profile:
+        tracemalloc.start()
+        with profiling(batch), stage("import"):
+            load_deferred_imports()
+
+    start = time.perf_counter()
+    for loc, result, error in run_locations(stale, jobs, opts):
+        report(loc, result, error)
+        if error is None and args.profile:
+            profile = {**result['profile'], "unexpected": result['unexpected']}
+            print(f"→ {write_profile(loc, profile, args.profile, opts)}")
+            batch.merge(result['profile'])
+        if error is None and loc['output'] in inputs:
+            manifest[loc['output']] = {
+                **inputs[loc['output']],
+                "outputs": {path: file_state(path) for path in location_outputs(loc)},
+            }
+        else:
+            manifest.pop(loc['output'], None)
+    elapsed = time.perf_counter() - start
+
+    if stale:
+        save_manifest(manifest, manifest_path)
+        print(f"\n{len(stale)} stations in {elapsed:.2f}s ({len(stale) / elapsed:.2f} stations/s)")
+    if args.profile:
+        tracemalloc.stop()
+        print_profile(batch.stages)
+    print(f"→ {write_index(locations, output_dir)}")
+    if args.sqlite:
+        built = [loc for loc in locations if loc['output'] in manifest]
+        export_sqlite(built, args.sqlite)
+        print(f"→ {args.sqlite} ({len(built)} station-years)")
+    if args.parquet:
+        built = [loc for loc in locations if loc['output'] in manifest]
+        export_parquet(built, args.parquet)
+        print(f"→ {args.parquet} ({len(built)} station-years)")
+    if cache_dir:
+        prune_cache(cache_dir, int(args.cache_max_mb * 2**20))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "windows":
+        return windows_main(args)
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    opts = {"cache_dir": cache_dir, "backend": args.backend, "layout": args.layout,
+            "profile": bool(args.profile)}
+
+    jobs = args.jobs or os.cpu_count()
+
+    if args.format == "ndjson":
+        locations = discover_locations(args.input_dir, args.store or args.output_dir,
+                                       load_catalogue(args.catalogue), args.years, args.store)
+        if not locations:
+            print(f"No IDO59001_<year>_WA_TPxxx.pdf files in {args.input_dir}")
+            return
+        out = sys.stdout
+        with redirect_stdout(sys.stderr):
+            stream_ndjson(locations, out, jobs, opts)
+        if cache_dir:
+            prune_cache(cache_dir, int(args.cache_max_mb * 2**20))
+        return
+
+    build(args, opts, jobs, args.force)
+    if args.watch:
+        watch(args.input_dir, lambda: build(args, opts, jobs), args.debounce)
 
 
 if __name__ == "__main__":
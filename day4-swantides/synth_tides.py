@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Write synthetic tide tables in the layout of the BOM IDO59001 PDFs, with ground truth.
+
+Each station gets seeded harmonic predictions, an IDO59001_<year>_WA_TPxxx.pdf
+laid out like IDO59001_2026_WA_TP015.pdf (a cover page, then three pages of
+four months in eight column bands) and a .json beside it holding the tides
+the PDF should extract to, in the same schema as tides_*.json.
+"""
+
+import argparse
+import json
+import os
+import random
+import zlib
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+# Left edge of the time column in each of the eight bands, and the offsets of
+# the other columns from it, as measured on IDO59001_2026_WA_TP015.pdf.
+TIME_X = [52.1, 117.0, 187.2, 252.0, 322.2, 387.0, 457.1, 522.0]
+DAY_GAP = 2.8       # right edge of day number / weekday to the time; under 3 so they merge
+HEIGHT_DX = 24.5
+UNIT_DX = 28.9
+
+HEADER_TOP = 87.5   # month names
+LABEL_TOP = 100.3   # 'Time' and 'm'
+BLOCK_TOP = 108.9   # first day number
+BLOCK_PITCH = 39.7  # one day
+ROW_DX = 4.1        # day number top to first tide row
+ROW_PITCH = 7.9
+WEEKDAY_DY = 2.0    # weekday sits just below the third tide row
+
+MONTHS = [
+    "JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
+    "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"
+]
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# Main tidal constituents: (period in hours, amplitude range in metres).
+CONSTITUENTS = {
+    "M2": (12.4206, (0.05, 0.35)),
+    "S2": (12.0000, (0.02, 0.15)),
+    "K1": (23.9345, (0.10, 0.35)),
+    "O1": (25.8193, (0.05, 0.25)),
+}
+MIN_RANGE = 0.03    # drop turning-point pairs closer than this in height
+
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+DESCENT = 0.207     # both fonts, as a fraction of the size
+# Helvetica advance widths (1/1000 em) for the glyphs that get right-aligned.
+WIDTHS = {**dict.fromkeys("0123456789", 556), ".": 278,
+          "A": 667, "E": 667, "F": 611, "H": 722, "M": 833, "O": 778,
+          "R": 722, "S": 667, "T": 611, "U": 722, "W": 944}
+
+COVER_TEXT = [
+    "Conditions of Use",
+    "Synthetic tide predictions generated for load testing and accuracy checks.",
+    "They follow the layout of the Bureau of Meteorology tide tables only.",
+    "Do not use them for navigation or any other purpose.",
+]
+
+
+def predict_tides(rng, year, mean=None):
+    """Turning points of a random four-constituent tide over `year`.
+
+    Returns (datetime, height, type) tuples, minute and centimetre resolution,
+    alternating strictly between high and low.
+    """
+    start = datetime(year, 1, 1)
+    minutes = np.arange(((datetime(year + 1, 1, 1) - start).days + 2) * 1440, dtype=np.float64) - 1440
+    h = np.full(len(minutes), rng.uniform(0.6, 1.0) if mean is None else mean)
+    for period, (lo, hi) in CONSTITUENTS.values():
+        h += rng.uniform(lo, hi) * np.cos(2 * np.pi * minutes / (period * 60) + rng.uniform(0, 2 * np.pi))
+
+    slope = np.sign(np.diff(h))
+    turns = np.flatnonzero(slope[1:] != slope[:-1]) + 1
+    points = []
+    for i in turns:
+        height = round(min(max(float(h[i]), 0.0), 2.49), 2)
+        kind = "high" if slope[i - 1] > 0 else "low"
+        if points and points[-1][2] == kind:
+            continue
+        if points and abs(points[-1][1] - height) < MIN_RANGE:
+            points.pop()
+            continue
+        points.append((start + timedelta(minutes=int(minutes[i])), height, kind))
+
+    return [p for p in points if p[0].year == year]
+
+
+def text_width(text, size):
+    return sum(WIDTHS.get(c, 600) for c in text) * size / 1000
+
+
+def table_page(station, year, months, tides_by_day):
+    """Text runs (font, size, x, top, text) for one page of four months."""
+    runs = [
+        ("F2", 14, 121.5, 45.0, f"{station.upper()} - WESTERN AUSTRALIA"),
+        ("F2", 24, 487.6, 45.8, str(year)),
+        ("F1", 10, 153.4, 73.9, "Times and Heights of High and Low Waters"),
+        ("F1", 10, 489.9, 73.9, "Local Time"),
+    ]
+    for slot, month_idx in enumerate(months):
+        left, right = TIME_X[2 * slot], TIME_X[2 * slot + 1] + HEIGHT_DX + 15.5
+        name = MONTHS[month_idx]
+        runs.append(("F2", 10, (left + right - text_width(name, 10)) / 2, HEADER_TOP, name))
+
+        first = date(year, month_idx + 1, 1)
+        days = ((first.replace(year=year + 1, month=1) if month_idx == 11 else first.replace(month=month_idx + 2))
+                - first).days
+        for band, day_range in enumerate((range(1, 16), range(16, days + 1))):
+            x = TIME_X[2 * slot + band]
+            runs.append(("F1", 8, x, LABEL_TOP, "Time"))
+            runs.append(("F1", 8, x + UNIT_DX, LABEL_TOP, "m"))
+            for row, day in enumerate(day_range):
+                top = BLOCK_TOP + row * BLOCK_PITCH
+                d = date(year, month_idx + 1, day)
+                label = str(day)
+                runs.append(("F2", 14, x - DAY_GAP - text_width(label, 14), top, label))
+                weekday = WEEKDAYS[d.weekday()]
+                runs.append(("F1", 8, x - DAY_GAP - text_width(weekday, 8),
+                             top + ROW_DX + 2 * ROW_PITCH + WEEKDAY_DY, weekday))
+                for k, (when, height, _) in enumerate(tides_by_day.get(d, [])):
+                    row_top = top + ROW_DX + k * ROW_PITCH
+                    runs.append(("F1", 8, x, row_top, f"{when:%H%M}"))
+                    runs.append(("F1", 8, x + HEIGHT_DX, row_top, f"{height:.2f}"))
+    return runs
+
+
+def cover_page():
+    return [("F2" if i == 0 else "F1", 12, 90.0, 77.4 + 22 * i, line) for i, line in enumerate(COVER_TEXT)]
+
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def content_stream(runs):
+    ops = []
+    for font, size, x, top, text in runs:
+        baseline = PAGE_HEIGHT - top - size + DESCENT * size
+        ops.append(f"BT /{font} {size} Tf 1 0 0 1 {x:.2f} {baseline:.2f} Tm ({escape(text)}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_pdf(path, pages, title):
+    """Write `pages` (lists of text runs) as a PDF using the standard Helvetica fonts."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    fonts = {name: add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode())
+             for name, base in FONTS.items()}
+    resources = "<< /Font << " + " ".join(f"/{name} {num} 0 R" for name, num in fonts.items()) + " >> >>"
+    pages_num = len(objects) + 2 * len(pages) + 1
+    kids = []
+    for runs in pages:
+        data = zlib.compress(content_stream(runs))
+        stream = add(f"<< /Length {len(data)} /Filter /FlateDecode >>\nstream\n".encode() + data + b"\nendstream")
+        kids.append(add(f"<< /Type /Page /Parent {pages_num} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                        f"/Resources {resources} /Contents {stream} 0 R >>".encode()))
+    add(f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode())
+    catalog = add(f"<< /Type /Catalog /Pages {pages_num} 0 R >>".encode())
+    info = add(f"<< /Title ({escape(title)}) /Creator (synth_tides.py) /Producer (synth_tides.py) >>".encode())
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n".encode()
+    out += f"startxref\n{xref}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_station(out_dir, code, year, seed):
+    """Write one station's PDF and ground truth. Returns the PDF path."""
+    rng = random.Random(f"{seed}-{code}-{year}")
+    tides = predict_tides(rng, year)
+    by_day = {}
+    for tide in tides:
+        by_day.setdefault(tide[0].date(), []).append(tide)
+
+    name = f"Synthetic {code}"
+    pages = [cover_page()] + [table_page(name, year, range(m, m + 4), by_day) for m in (0, 4, 8)]
+    stem = os.path.join(out_dir, f"IDO59001_{year}_WA_{code}")
+    write_pdf(f"{stem}.pdf", pages, f"{name} {year}")
+
+    with open(f"{stem}.json", "w") as f:
+        json.dump({
+            "location": name,
+            "year": year,
+            "source": f"synth_tides.py seed {seed}",
+            "tides": [{"date": f"{when:%Y-%m-%d}", "time": f"{when:%H:%M}", "height": height, "type": kind}
+                      for when, height, kind in tides],
+        }, f, indent=2)
+    return f"{stem}.pdf"
+
+
+def check_station(pdf, opts):
+    """Extract `pdf` and compare with its ground truth. Returns (expected, missing, extra, mislabelled)."""
+    import extract_tides as et
+
+    year = int(et.PDF_PATTERN.fullmatch(os.path.basename(pdf)).group(1))
+    with open(os.path.splitext(pdf)[0] + ".json") as f:
+        truth = {(t['date'], t['time'], t['height']): t['type'] for t in json.load(f)['tides']}
+    raw = et.extract_all(pdf, opts=opts, year=year)
+    table = et.classify_table(et.TideTable.from_entries(raw).unique())
+    got = {(t['date'], t['time'], t['height']): t['type'] for t in table.to_records()}
+    mislabelled = sum(got[k] != kind for k, kind in truth.items() if k in got)
+    return len(truth), len(truth.keys() - got.keys()), len(got.keys() - truth.keys()), mislabelled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", help="directory for the PDFs and ground-truth JSON")
+    parser.add_argument("-n", "--stations", type=int, default=10, help="number of stations (default: 10)")
+    parser.add_argument("--years", type=int, nargs="+", default=[2026], help="years to generate (default: 2026)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--first-code", type=int, default=100, help="first station number, TPnnn (default: 100)")
+    parser.add_argument("--check", action="store_true",
+                        help="extract every generated PDF and compare it with its ground truth")
+    parser.add_argument("--backend", default="pdfplumber", help="extraction backend for --check")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    pdfs = [make_station(args.out_dir, f"TP{args.first_code + i:03d}", year, args.seed)
+            for i in range(args.stations) for year in args.years]
+    print(f"Wrote {len(pdfs)} PDFs to {args.out_dir}")
+
+    if args.check:
+        failed = 0
+        for pdf in pdfs:
+            expected, missing, extra, mislabelled = check_station(
+                pdf, {"backend": args.backend, "layout": "auto"})
+            ok = not (missing or extra or mislabelled)
+            failed += not ok
+            print(f"{'✓' if ok else '✗'} {os.path.basename(pdf)}: {expected} tides, "
+                  f"{missing} missing, {extra} extra, {mislabelled} mislabelled")
+        if failed:
+            raise SystemExit(f"{failed} of {len(pdfs)} PDFs did not match their ground truth")
+
+
+if __name__ == "__main__":
+    main()